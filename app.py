@@ -1,10 +1,41 @@
+import math
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+import orjson
+from flask import Flask, g, render_template, stream_template, request, redirect, url_for, flash, get_flashed_messages
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
-from models import db, Student, Grade, StudentTracker
+from sqlalchemy import event
+from sqlalchemy.orm import load_only, raiseload, selectinload
+from models import db, Student, Grade, StudentTracker, get_student_by_roll, upgrade_schema
+
+cache = Cache()
+
+STUDENTS_PER_PAGE = 50
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which serializes in C and is several times faster than stdlib json."""
+
+    # orjson output is already compact, so separators can be ignored and indent maps to OPT_INDENT_2.
+    # Anything else orjson cannot honour (e.g. the session serializer's object_hook, cls) uses stdlib json.
+    ORJSON_DUMPS_KWARGS = {"indent", "separators"}
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - self.ORJSON_DUMPS_KWARGS:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
 
     # Secret key for session (used by flash messages)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'devkey')
@@ -12,14 +43,112 @@ def create_app():
     # Database configuration: use Render's DATABASE_URL or fallback to local sqlite
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///students.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ECHO'] = False
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # Size the pool for many concurrent greenlets waiting on the database;
+        # recycle/pre-ping so stale managed-Postgres connections are replaced before use
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': 20,
+            'max_overflow': 40,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        }
+
+    # Cache for read views, invalidated on writes. SimpleCache is per-process, which is why
+    # Procfile/render.yaml run a single gunicorn worker; set CACHE_TYPE=RedisCache and
+    # CACHE_REDIS_URL before running more than one
+    app.config['CACHE_TYPE'] = os.getenv('CACHE_TYPE', 'SimpleCache')
+    app.config['CACHE_DEFAULT_TIMEOUT'] = 300
+    if os.getenv('CACHE_REDIS_URL'):
+        app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
 
     db.init_app(app)
+    cache.init_app(app)
 
     # Create database tables if not exist
     with app.app_context():
+        # SQLite fallback: WAL makes commits appends, synchronous=NORMAL skips the per-commit fsync,
+        # and memory-mapped reads / a larger page cache avoid syscall copies
+        if db.engine.dialect.name == 'sqlite':
+            @event.listens_for(db.engine, 'connect')
+            def _set_sqlite_pragmas(dbapi_conn, _):
+                cursor = dbapi_conn.cursor()
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.execute('PRAGMA temp_store=MEMORY')
+                cursor.execute('PRAGMA mmap_size=268435456')
+                cursor.execute('PRAGMA cache_size=-65536')
+                cursor.close()
+
         db.create_all()
+        upgrade_schema()
+
+    def get_tracker():
+        """Request-scoped StudentTracker, so no service state is shared across threads/greenlets."""
+        if 'tracker' not in g:
+            g.tracker = StudentTracker(db.session)
+        return g.tracker
+
+    @app.teardown_request
+    def remove_session(exc):
+        db.session.remove()
+
+    def read_only_options(*options):
+        """Loader options for detail queries; in debug any undeclared lazy load raises instead of silently adding a query."""
+        if app.debug:
+            return (*options, raiseload('*'))
+        return options
 
-    tracker = StudentTracker(db.session)
+    def begin_read_only():
+        """On Postgres, start the session's transaction as READ ONLY so reads can later be routed to a replica."""
+        if db.engine.dialect.name == 'postgresql' and not db.session().in_transaction():
+            db.session.connection(execution_options={'postgresql_readonly': True})
+
+    # -------------------- CACHED READS --------------------
+    # Plain dicts are cached (not rendered pages) so flash messages are never replayed.
+
+    @cache.memoize()
+    def get_students_page(page):
+        begin_read_only()
+        # Bounded page of students, fetching only the columns the list shows (no grades)
+        pagination = (Student.query
+                      .options(load_only(Student.roll_number, Student.name))
+                      .order_by(Student.id)
+                      .paginate(page=page, per_page=STUDENTS_PER_PAGE, error_out=False))
+        return {
+            "students": [
+                {"roll_number": student.roll_number, "name": student.name}
+                for student in pagination.items
+            ],
+            "page": pagination.page,
+            "pages": pagination.pages,
+            "prev_num": pagination.prev_num,
+            "next_num": pagination.next_num,
+        }
+
+    @cache.memoize()
+    def get_student_dict(roll_number):
+        begin_read_only()
+        student = get_student_by_roll(roll_number, *read_only_options(selectinload(Student.grades)))
+        return student.to_dict() if student else None
+
+    @cache.memoize()
+    def get_student_average(roll_number):
+        begin_read_only()
+        student = get_student_by_roll(roll_number, *read_only_options())
+        if not student:
+            return None
+        return {
+            "roll_number": student.roll_number,
+            "name": student.name,
+            "average": student.average,
+        }
+
+    def invalidate_student_cache(roll_number):
+        roll_number = (roll_number or "").strip()
+        cache.delete_memoized(get_students_page)
+        cache.delete_memoized(get_student_dict, roll_number)
+        cache.delete_memoized(get_student_average, roll_number)
 
     # -------------------- ROUTES --------------------
 
@@ -29,8 +158,12 @@ def create_app():
 
     @app.route('/students')
     def list_students():
-        students = Student.query.all()
-        return render_template('list_students.html', students=students)
+        page = request.args.get('page', 1, type=int)
+        pagination = get_students_page(page)
+        # Pop flashes before streaming: the session cookie is sent with the headers,
+        # so popping them mid-stream would not persist. The template reuses this result.
+        get_flashed_messages(with_categories=True)
+        return app.response_class(stream_template('list_students.html', students=pagination['students'], pagination=pagination))
 
     @app.route('/add_student', methods=['GET', 'POST'])
     def add_student():
@@ -42,7 +175,8 @@ def create_app():
                 return redirect(url_for('add_student'))
 
             try:
-                tracker.add_student(name, roll_number)
+                get_tracker().add_student(name, roll_number)
+                invalidate_student_cache(roll_number)
                 flash("Student added successfully!", "success")
                 return redirect(url_for('list_students'))
             except Exception as e:
@@ -51,6 +185,34 @@ def create_app():
 
         return render_template('add_student.html')
 
+    @app.route('/add_students_bulk', methods=['GET', 'POST'])
+    def add_students_bulk():
+        if request.method == 'POST':
+            students_text = request.form['students']
+            if not students_text:
+                flash("All fields are required.", "error")
+                return redirect(url_for('add_students_bulk'))
+
+            try:
+                # One "name,roll_number" pair per line
+                students = []
+                for line in students_text.splitlines():
+                    if not line.strip():
+                        continue
+                    name, _, roll_number = line.rpartition(',')
+                    students.append((name, roll_number))
+
+                count = get_tracker().bulk_add(students)
+                for _, roll_number in students:
+                    invalidate_student_cache(roll_number)
+                flash(f"{count} students added successfully!", "success")
+                return redirect(url_for('list_students'))
+            except Exception as e:
+                flash(f"Error: {e}", "error")
+                return redirect(url_for('add_students_bulk'))
+
+        return render_template('add_students_bulk.html')
+
     @app.route('/add_grade', methods=['GET', 'POST'])
     def add_grade():
         if request.method == 'POST':
@@ -64,11 +226,12 @@ def create_app():
 
             try:
                 grade = float(grade)
-                if grade < 0 or grade > 100:
+                if not math.isfinite(grade) or grade < 0 or grade > 100:
                     flash("Grade must be between 0 and 100.", "error")
                     return redirect(url_for('add_grade'))
 
-                tracker.add_grades(roll_number, subject, grade)
+                get_tracker().add_grades(roll_number, subject, grade)
+                invalidate_student_cache(roll_number)
                 flash("Grade added successfully!", "success")
                 return redirect(url_for('student_details', roll_number=roll_number))
             except Exception as e:
@@ -77,22 +240,63 @@ def create_app():
 
         return render_template('add_grade.html')
 
+    @app.route('/add_grades_bulk', methods=['GET', 'POST'])
+    def add_grades_bulk():
+        if request.method == 'POST':
+            roll_number = request.form['roll_number']
+            grades_text = request.form['grades']
+
+            if not roll_number or not grades_text:
+                flash("All fields are required.", "error")
+                return redirect(url_for('add_grades_bulk'))
+
+            try:
+                # One "subject,grade" pair per line
+                items = []
+                for line in grades_text.splitlines():
+                    if not line.strip():
+                        continue
+                    subject, _, grade = line.rpartition(',')
+                    grade = float(grade)
+                    if not math.isfinite(grade) or grade < 0 or grade > 100:
+                        flash("Grade must be between 0 and 100.", "error")
+                        return redirect(url_for('add_grades_bulk'))
+                    items.append((subject, grade))
+
+                count = get_tracker().add_grades_bulk(roll_number, items)
+                invalidate_student_cache(roll_number)
+                flash(f"{count} grades added successfully!", "success")
+                return redirect(url_for('student_details', roll_number=roll_number))
+            except Exception as e:
+                flash(f"Error: {e}", "error")
+                return redirect(url_for('add_grades_bulk'))
+
+        return render_template('add_grades_bulk.html')
+
     @app.route('/student/<roll_number>')
     def student_details(roll_number):
-        student = Student.query.filter_by(roll_number=roll_number).first()
+        student = get_student_dict(roll_number)
         if not student:
             flash("Student not found.", "error")
             return redirect(url_for('list_students'))
-        return render_template('view_student.html', student=student, grades=student.grades)
+        return render_template('view_student.html', student=student, grades=student['grades'])
 
     @app.route('/average/<roll_number>')
     def average(roll_number):
-        student = Student.query.filter_by(roll_number=roll_number).first()
+        student = get_student_average(roll_number)
         if not student:
             flash("Student not found.", "error")
             return redirect(url_for('list_students'))
-        average = student.calculate_average()
-        return render_template('average.html', student=student, average=average)
+        return render_template('average.html', student=student, average=student['average'])
+
+    # -------------------- API --------------------
+
+    @app.route('/api/student/<roll_number>')
+    def api_student(roll_number):
+        student = get_student_dict(roll_number)
+        if not student:
+            return app.json.response(error="Student not found."), 404
+        return app.json.response(student)
 
     return app
 
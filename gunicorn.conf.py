@@ -0,0 +1,9 @@
+"""gunicorn settings loaded by Procfile / render.yaml (-c)."""
+
+
+def post_fork(server, worker):
+    # -k gevent already monkey-patches the stdlib in each worker; psycopg2 is a C extension
+    # and needs psycogreen to yield to other greenlets while it waits on Postgres.
+    # Runs before the worker imports the app, so no connection is opened unpatched.
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
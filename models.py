@@ -1,44 +1,141 @@
+import math
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import UniqueConstraint
-from typing import Dict, Optional
+from sqlalchemy import CheckConstraint, Index, UniqueConstraint, bindparam, func, insert, inspect, select, text, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload, scoped_session, selectinload
+from typing import Dict, Iterable, Optional, Tuple
 
 db = SQLAlchemy()
 
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE
+UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+def validate_grade(grade: float):
+    """Reject non-finite grades; on SQLite, whose older files lack ck_grade_range, also check the 0-100 range."""
+    if not math.isfinite(grade):
+        raise ValueError("Grade must be a finite number.")
+    if db.engine.dialect.name == "sqlite" and (grade < 0 or grade > 100):
+        raise ValueError("Grade must be between 0 and 100.")
+
+def integrity_error_message(error: IntegrityError, action: str) -> str:
+    """Readable message for a constraint violation, without the SQL and parameters."""
+    if "ck_grade_range" in str(error.orig):
+        return f"{action}: grade must be between 0 and 100."
+    return f"{action}: it violates a database constraint."
+
+def normalize_subject(subject: str) -> str:
+    """Canonical form of a subject used for uniqueness and lookups; display casing stays in Grade.subject."""
+    return (subject or "").strip().lower()
+
 def init_db(app):
     """Create tables if they do not exist."""
     with app.app_context():
         db.create_all()
 
+def upgrade_schema():
+    """Add columns and indexes introduced after a table was first created (create_all never alters tables)."""
+    inspector = inspect(db.engine)
+    student_columns = {c["name"] for c in inspector.get_columns("students")}
+    grade_columns = {c["name"]: c for c in inspector.get_columns("grades")}
+    grade_checks = {c["name"] for c in inspector.get_check_constraints("grades")}
+    with db.engine.begin() as conn:
+        if "average" not in student_columns:
+            conn.execute(text("ALTER TABLE students ADD COLUMN average FLOAT"))
+            conn.execute(text(
+                "UPDATE students SET average = "
+                "(SELECT ROUND(CAST(AVG(grade) AS NUMERIC), 2) FROM grades WHERE grades.student_id = students.id)"
+            ))
+        if "subject_key" not in grade_columns:
+            # Check before altering anything: the unique index would reject these rows
+            collisions = conn.execute(text(
+                "SELECT student_id, LOWER(TRIM(subject)) FROM grades "
+                "GROUP BY student_id, LOWER(TRIM(subject)) HAVING COUNT(*) > 1"
+            )).all()
+            if collisions:
+                student_id, key = collisions[0]
+                raise RuntimeError(
+                    f"Cannot add grades.subject_key: {len(collisions)} student(s) have subjects that differ "
+                    f"only by case or whitespace (e.g. student_id={student_id}, '{key}'). "
+                    "Merge or rename those grades, then restart."
+                )
+            conn.execute(text("ALTER TABLE grades ADD COLUMN subject_key VARCHAR(100)"))
+            conn.execute(text("UPDATE grades SET subject_key = LOWER(TRIM(subject))"))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX uq_student_subject_key ON grades (student_id, subject_key)"
+            ))
+        # Superseded by uq_student_subject_key
+        conn.execute(text("DROP INDEX IF EXISTS uq_student_subject_ci"))
+        # SQLite can neither alter a column's nullability nor drop a table constraint in place
+        if db.engine.dialect.name == "postgresql":
+            if grade_columns.get("subject_key", {"nullable": True})["nullable"]:
+                conn.execute(text("ALTER TABLE grades ALTER COLUMN subject_key SET NOT NULL"))
+            conn.execute(text("ALTER TABLE grades DROP CONSTRAINT IF EXISTS uq_student_subject"))
+        # SQLite cannot add constraints to an existing table; validate_grade() covers those files
+        if "ck_grade_range" not in grade_checks and db.engine.dialect.name != "sqlite":
+            conn.execute(text(
+                "ALTER TABLE grades ADD CONSTRAINT ck_grade_range CHECK (grade BETWEEN 0 AND 100)"
+            ))
+
 class Student(db.Model):
     """
     Student entity (OOP + ORM)
-    - Attributes: name, roll_number
+    - Attributes: name, roll_number, average (denormalized, kept in sync on grade writes)
     - Relationship: grades (list of Grade)
     - Helper methods: to_dict(), grades_as_dict()
     """
     __tablename__ = "students"
     id = db.Column(db.Integer, primary_key=True)
-    roll_number = db.Column(db.String(50), unique=True, nullable=False)
+    roll_number = db.Column(db.String(50), unique=True, index=True, nullable=False)
     name = db.Column(db.String(200), nullable=False)
+    average = db.Column(db.Float, nullable=True)
 
     # Relationship: one-to-many with Grade
-    grades = db.relationship("Grade", backref="student", cascade="all, delete-orphan", lazy=True)
+    grades = db.relationship("Grade", back_populates="student", cascade="all, delete-orphan", lazy="select")
 
     def add_grade(self, subject: str, grade: float):
-        """Add or update a grade for the given subject."""
+        """Add or update a grade for the given subject. The 0-100 range is enforced by ck_grade_range."""
         # Validate subject and grade
         subject = (subject or "").strip()
         if not subject:
             raise ValueError("Subject cannot be empty.")
-        if grade < 0 or grade > 100:
-            raise ValueError("Grade must be between 0 and 100.")
+        validate_grade(grade)
+
+        key = normalize_subject(subject)
 
-        # Upsert: if grade for subject exists, update; else insert
-        existing = next((g for g in self.grades if g.subject.lower() == subject.lower()), None)
+        # Upsert in a single statement where the dialect supports it,
+        # matching subjects case-insensitively via uq_student_subject_key
+        dialect_insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+        if dialect_insert is not None and self.id is not None:
+            stmt = dialect_insert(Grade).values(student_id=self.id, subject=subject, subject_key=key, grade=grade)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Grade.student_id, Grade.subject_key],
+                set_={"grade": stmt.excluded.grade},
+            )
+            db.session.execute(stmt)
+            # The loaded collection (if any) no longer reflects the table
+            db.session.expire(self, ["grades"])
+            self.average = self.calculate_average_sql(db.session)
+            return
+
+        # Fallback: indexed lookup of an existing grade for the subject; update it, else insert
+        existing = None
+        if self.id is not None:
+            existing = Grade.query.filter_by(student_id=self.id, subject_key=key).first()
         if existing:
             existing.grade = grade
         else:
-            self.grades.append(Grade(subject=subject, grade=grade))
+            self.grades.append(Grade(subject=subject, subject_key=key, grade=grade))
+        # A student not yet persisted has no rows for AVG() to see; use the in-memory grades
+        if self.id is None:
+            self.average = self.calculate_average()
+        else:
+            self.average = self.calculate_average_sql(db.session)
 
     def calculate_average(self) -> Optional[float]:
         """Calculate average grade across all subjects. Returns None if no grades."""
@@ -47,6 +144,13 @@ class Student(db.Model):
         total = sum(g.grade for g in self.grades)
         return round(total / len(self.grades), 2)
 
+    def calculate_average_sql(self, session) -> Optional[float]:
+        """Calculate average grade with a SQL AVG() without loading the grades. Returns None if no grades."""
+        average = session.query(func.avg(Grade.grade)).filter_by(student_id=self.id).scalar()
+        if average is None:
+            return None
+        return round(average, 2)
+
     def grades_as_dict(self) -> Dict[str, float]:
         """Return grades as {subject: grade}."""
         return {g.subject: g.grade for g in self.grades}
@@ -56,26 +160,39 @@ class Student(db.Model):
             "roll_number": self.roll_number,
             "name": self.name,
             "grades": self.grades_as_dict(),
-            "average": self.calculate_average(),
+            "average": self.average,
         }
 
 class Grade(db.Model):
     """
     Grade entity
     - Links to a Student via student_id
-    - Subject+Student uniqueness is enforced
+    - Subject+Student uniqueness is enforced on the normalized subject_key
+    - Grade range (0-100) is enforced by a CHECK constraint
     """
     __tablename__ = "grades"
     id = db.Column(db.Integer, primary_key=True)
     subject = db.Column(db.String(100), nullable=False)
+    subject_key = db.Column(db.String(100), nullable=False)
     grade = db.Column(db.Float, nullable=False)
 
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
+    student = db.relationship("Student", back_populates="grades")
 
     __table_args__ = (
-        UniqueConstraint("student_id", "subject", name="uq_student_subject"),
+        UniqueConstraint("student_id", "subject_key", name="uq_student_subject_key"),
+        Index("ix_grades_student", "student_id"),
+        CheckConstraint("grade BETWEEN 0 AND 100", name="ck_grade_range"),
     )
 
+# Hot statements built once; SQLAlchemy caches their compiled SQL across requests
+SELECT_STUDENT_BY_ROLL = select(Student).where(Student.roll_number == bindparam("roll"))
+
+def get_student_by_roll(roll_number: str, *options, session=None) -> Optional[Student]:
+    """Look up a student by roll number, applying any loader options. Returns None if not found."""
+    stmt = SELECT_STUDENT_BY_ROLL.options(*options) if options else SELECT_STUDENT_BY_ROLL
+    return (session or db.session).execute(stmt, {"roll": roll_number}).scalar_one_or_none()
+
 class StudentTracker:
     """
     Service/Manager class to handle collection-level operations.
@@ -84,6 +201,20 @@ class StudentTracker:
     def __init__(self, db_session):
         self.db = db_session
 
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a block as one transaction: a single commit, rolled back on error.
+        Refuses to run inside an already open transaction, whose outcome it could not control
+        (pysqlite does not emit BEGIN for reads, so a SAVEPOINT there would commit on its own).
+        """
+        # scoped_session does not proxy in_transaction(); ask the current session
+        session = self.db() if isinstance(self.db, scoped_session) else self.db
+        if session.in_transaction():
+            raise RuntimeError("Bulk writes need their own transaction; commit or roll back the session first.")
+        with self.db.begin():
+            yield
+
     def add_student(self, name: str, roll_number: str):
         roll_number = (roll_number or "").strip()
         name = (name or "").strip()
@@ -91,7 +222,7 @@ class StudentTracker:
             raise ValueError("Name and Roll Number are required.")
 
         # Uniqueness check
-        if Student.query.filter_by(roll_number=roll_number).first():
+        if get_student_by_roll(roll_number, session=self.db):
             raise ValueError(f"Roll number '{roll_number}' already exists.")
 
         student = Student(name=name, roll_number=roll_number)
@@ -99,23 +230,120 @@ class StudentTracker:
         self.db.commit()
 
     def add_grades(self, roll_number: str, subject: str, grade: float):
-        student = Student.query.filter_by(roll_number=roll_number).first()
+        student = get_student_by_roll(roll_number, session=self.db)
         if not student:
             raise ValueError(f"No student found with roll number {roll_number}.")
-        student.add_grade(subject, grade)
-        self.db.commit()
+        try:
+            student.add_grade(subject, grade)
+            self.db.commit()
+        except IntegrityError as e:
+            self.db.rollback()
+            raise ValueError(integrity_error_message(e, "Grade could not be saved")) from None
+
+    def add_grades_bulk(self, roll_number: str, items: Iterable[Tuple[str, float]]) -> int:
+        """Add or update many (subject, grade) pairs for one student in a single executemany + commit."""
+        return self.bulk_add_grades((roll_number, subject, grade) for subject, grade in items)
+
+    def bulk_add(self, students: Iterable[Tuple[str, str]]) -> int:
+        """Insert many (name, roll_number) pairs in one transaction with a single executemany."""
+        rows = []
+        seen = set()
+        for name, roll_number in students:
+            roll_number = (roll_number or "").strip()
+            name = (name or "").strip()
+            if not name or not roll_number:
+                raise ValueError("Name and Roll Number are required.")
+            if roll_number in seen:
+                raise ValueError(f"Duplicate roll number '{roll_number}' in batch.")
+            seen.add(roll_number)
+            rows.append({"name": name, "roll_number": roll_number})
+
+        if not rows:
+            raise ValueError("No students provided.")
+
+        with self._transaction():
+            # Uniqueness check for the whole batch in one query
+            existing = self.db.execute(
+                select(Student.roll_number).where(Student.roll_number.in_(seen))
+            ).scalars().first()
+            if existing:
+                raise ValueError(f"Roll number '{existing}' already exists.")
+            try:
+                self.db.execute(insert(Student), rows)
+            except IntegrityError as e:
+                # A concurrent insert can take a roll number between the check and the executemany
+                raise ValueError(integrity_error_message(e, "Students could not be saved")) from None
+        return len(rows)
+
+    def bulk_add_grades(self, grades: Iterable[Tuple[str, str, float]]) -> int:
+        """Add or update many (roll_number, subject, grade) rows in one transaction with a single executemany."""
+        items = []
+        seen = set()
+        for roll_number, subject, grade in grades:
+            subject = (subject or "").strip()
+            if not subject:
+                raise ValueError("Subject cannot be empty.")
+            validate_grade(grade)
+            key = normalize_subject(subject)
+            if (roll_number, key) in seen:
+                raise ValueError(f"Duplicate subject '{subject}' for {roll_number} in batch.")
+            seen.add((roll_number, key))
+            items.append((roll_number, subject, key, grade))
+
+        if not items:
+            raise ValueError("No grades provided.")
+
+        with self._transaction():
+            # Resolve every roll number to its id in one query
+            rolls = {roll_number for roll_number, _, _, _ in items}
+            student_ids = dict(self.db.execute(
+                select(Student.roll_number, Student.id).where(Student.roll_number.in_(rolls))
+            ).all())
+            missing = rolls - student_ids.keys()
+            if missing:
+                raise ValueError(f"No student found with roll number {sorted(missing)[0]}.")
+
+            rows = [
+                {"student_id": student_ids[roll_number], "subject": subject, "subject_key": key, "grade": grade}
+                for roll_number, subject, key, grade in items
+            ]
+            # Same add-or-update semantics as Student.add_grade, where the dialect supports it
+            dialect_insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+            if dialect_insert is not None:
+                stmt = dialect_insert(Grade)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Grade.student_id, Grade.subject_key],
+                    set_={"grade": stmt.excluded.grade},
+                )
+            else:
+                stmt = insert(Grade)
+            try:
+                self.db.execute(stmt, rows)
+            except IntegrityError as e:
+                raise ValueError(integrity_error_message(e, "Grades could not be saved")) from None
+
+            # Refresh the denormalized averages of the affected students in one pass
+            averages = self.db.execute(
+                select(Grade.student_id, func.avg(Grade.grade))
+                .where(Grade.student_id.in_(student_ids.values()))
+                .group_by(Grade.student_id)
+            ).all()
+            self.db.execute(update(Student), [
+                {"id": student_id, "average": round(average, 2)} for student_id, average in averages
+            ])
+        return len(rows)
 
     def view_student_details(self, roll_number: str) -> Dict:
-        student = Student.query.filter_by(roll_number=roll_number).first()
+        student = get_student_by_roll(roll_number, selectinload(Student.grades), raiseload("*"), session=self.db)
         if not student:
             raise ValueError(f"No student found with roll number {roll_number}.")
         return student.to_dict()
 
     def calculate_average(self, roll_number: str) -> Optional[float]:
-        student = Student.query.filter_by(roll_number=roll_number).first()
+        student = get_student_by_roll(roll_number, session=self.db)
         if not student:
             raise ValueError(f"No student found with roll number {roll_number}.")
-        return student.calculate_average()
+        return student.average
 
     @staticmethod
     def calculate_average_for_student(student: Student) -> Optional[float]:
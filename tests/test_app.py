@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    import app as app_module
+    from models import db, StudentTracker
+
+    app = app_module.create_app()
+    # debug turns on raiseload("*") for the detail queries; testing propagates their errors
+    app.debug = True
+    app.testing = True
+
+    with app.app_context():
+        tracker = StudentTracker(db.session)
+        tracker.add_student("Ann", "R1")
+        tracker.add_grades("R1", "Math", 80)
+        tracker.add_grades("R1", "Science", 70)
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_student_details_has_no_lazy_loads(client):
+    try:
+        response = client.get("/student/R1")
+    except InvalidRequestError as e:
+        pytest.fail(f"Undeclared lazy load on /student: {e}")
+    assert response.status_code == 200
+    assert b"Math" in response.data
+    assert b"80.0" in response.data
+
+
+def test_average_has_no_lazy_loads(client):
+    try:
+        response = client.get("/average/R1")
+    except InvalidRequestError as e:
+        pytest.fail(f"Undeclared lazy load on /average: {e}")
+    assert response.status_code == 200
+    assert b"75.0" in response.data
+
+
+def test_bulk_add_commits_its_own_transaction(app):
+    from models import db, StudentTracker, get_student_by_roll
+
+    with app.app_context():
+        assert StudentTracker(db.session).bulk_add([("Zed", "R9")]) == 1
+        db.session.rollback()
+        assert get_student_by_roll("R9") is not None
+
+
+def test_bulk_add_refuses_an_open_transaction(app):
+    from models import db, Student, StudentTracker, get_student_by_roll
+
+    with app.app_context():
+        get_student_by_roll("R1")
+        db.session.add(Student(name="Pending", roll_number="P1"))
+        with pytest.raises(RuntimeError):
+            StudentTracker(db.session).bulk_add([("Zed", "R9")])
+        # The caller's transaction is untouched and still theirs to finish
+        db.session.rollback()
+        assert get_student_by_roll("R9") is None
+        assert get_student_by_roll("P1") is None
+
+
+def test_non_finite_grades_are_rejected(app, client):
+    from models import db, StudentTracker
+
+    response = client.post("/add_grade", data={"roll_number": "R1", "subject": "Geo", "grade": "nan"},
+                           follow_redirects=True)
+    assert b"Grade must be between 0 and 100." in response.data
+
+    with app.app_context():
+        tracker = StudentTracker(db.session)
+        with pytest.raises(ValueError, match="finite"):
+            tracker.add_grades("R1", "Geo", float("nan"))
+        with pytest.raises(ValueError, match="finite"):
+            tracker.add_grades_bulk("R1", [("Geo", float("inf"))])
+        assert "Geo" not in tracker.view_student_details("R1")["grades"]
+
+
+def test_bulk_add_reports_a_racing_duplicate_readably(app, monkeypatch):
+    from models import db, StudentTracker
+
+    with app.app_context():
+        tracker = StudentTracker(db.session)
+        # Simulate another request inserting R9 after the uniqueness check ran
+        real_execute = db.session.execute
+
+        def execute(stmt, *args, **kwargs):
+            if getattr(stmt, "is_insert", False):
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql("INSERT INTO students (roll_number, name) VALUES ('R9', 'Other')")
+            return real_execute(stmt, *args, **kwargs)
+
+        monkeypatch.setattr(db.session, "execute", execute)
+        with pytest.raises(ValueError, match="Students could not be saved"):
+            tracker.bulk_add([("Zed", "R9")])
+
+
+def create_baseline_db(path, *grades):
+    """SQLite file with the original schema (no average, no subject_key)."""
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE students (id INTEGER PRIMARY KEY, roll_number VARCHAR(50) NOT NULL UNIQUE,"
+        " name VARCHAR(200) NOT NULL);"
+        "CREATE TABLE grades (id INTEGER PRIMARY KEY, subject VARCHAR(100) NOT NULL, grade FLOAT NOT NULL,"
+        " student_id INTEGER NOT NULL REFERENCES students(id),"
+        " CONSTRAINT uq_student_subject UNIQUE (student_id, subject));"
+        "INSERT INTO students VALUES (1, 'R1', 'Old');"
+    )
+    conn.executemany("INSERT INTO grades (subject, grade, student_id) VALUES (?, ?, 1)", grades)
+    conn.commit()
+    conn.close()
+
+
+def test_upgrade_schema_backfills_a_baseline_db(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    create_baseline_db(path, ("Math", 80), ("Art", 60))
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    import app as app_module
+    from models import db, StudentTracker
+
+    app = app_module.create_app()
+    with app.app_context():
+        tracker = StudentTracker(db.session)
+        tracker.add_grades("R1", "MATH", 100)
+        assert tracker.view_student_details("R1") == {
+            "roll_number": "R1", "name": "Old", "grades": {"Math": 100.0, "Art": 60.0}, "average": 80.0,
+        }
+
+
+def test_upgrade_schema_stops_on_subject_collisions(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    create_baseline_db(path, ("Math", 80), ("math ", 70))
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    import app as app_module
+
+    with pytest.raises(RuntimeError, match="differ only by case or whitespace"):
+        app_module.create_app()